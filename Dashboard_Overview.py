@@ -54,7 +54,7 @@ st.markdown(
     **Generalizability**: This model was primarily evaluated within the local setting of DUHS. Do not use this model in an 
     external setting without further evaluation.\n
     **Discontinue use if**: There are concerns regarding the utility of the model for the indicated use case or large, 
-    systemic changes occur at the data level that necessitates re-training of the model.
+    systemic changes occur at the data level that necessitates re-training of the model (see the Data Drift page).
     """
 )
 
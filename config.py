@@ -16,5 +16,9 @@ class ADHD(Diagnoses):
 
 class Config(BaseModel):
     patient_data: Path
+    patient_store: Path
+    history_index: Path
+    snapshot_dir: Path
+    patient_embeddings: Path
     autism: Diagnoses
     adhd: Diagnoses
@@ -0,0 +1,199 @@
+"""
+Distribution drift between weekly prediction snapshots.
+
+At ingest, every week is reduced to histograms of each diagnosis's likelihood and
+per-bin predictions, overall and per sex, race and insurance group, and saved as a
+small JSON file per ISO week. Each variable has its own edges, set once from the
+quantiles of the first snapshot and reused by every later one. Drift statistics are
+computed from those histograms only, so comparing against old weeks never reloads
+their full datasets.
+"""
+
+import json
+from ast import literal_eval
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+HISTOGRAM_BINS = 50
+GROUP_COLUMNS = ["Sex", "Race", "Insurance"]
+LABELS = ["autism", "adhd"]
+
+
+def bin_names(bin_boundaries):
+    """Ex: [0.0, 4.0, 9.2] -> ['Predictions (0-4y)', 'Predictions (4-9.2y)', 'Predictions (≥9.2y)']"""
+    ranges = [f"{start:g}-{end:g}" for start, end in zip(bin_boundaries, bin_boundaries[1:])]
+    return [f"Predictions ({r}y)" for r in ranges + [f"≥{bin_boundaries[-1]:g}"]]
+
+
+def quantile_edges(values):
+    """
+    Histogram edges at the quantiles of `values`, widened to [0, 1], so that every bin
+    starts with about the same share of patients, even for values crowded near 0.
+    """
+    interior = np.quantile(values, np.linspace(0, 1, HISTOGRAM_BINS + 1)[1:-1])
+    return np.unique(np.concatenate([[0.0], interior, [1.0]]))
+
+
+def histograms(values, groups, edges):
+    """Counts of `values` overall and within every group of every grouping column."""
+    counts = {"All": {"All": np.histogram(values, edges)[0].tolist()}}
+    for column, group_values in groups.items():
+        counts[column] = {
+            group: np.histogram(values[group_values == group], edges)[0].tolist()
+            for group in np.unique(group_values)
+        }
+    return {"edges": [float(edge) for edge in edges], "counts": counts}
+
+
+def snapshot_week(snapshot_date):
+    """Ex: 2026-10-19 -> '2026-W43'; snapshots are kept one per ISO week."""
+    year, week, _ = snapshot_date.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def build_snapshot(df, config, snapshot_date=None, reference=None):
+    """
+    Compact histogram summary of one week's patient store. Each variable's edges are
+    taken from `reference` (the first snapshot) when it has them, so that all weeks
+    share the same bins, and from this week's quantiles otherwise.
+    """
+    snapshot_date = snapshot_date or date.today()
+    groups = {column: df[column].to_numpy().astype(str) for column in GROUP_COLUMNS}
+    snapshot = {
+        "date": str(snapshot_date),
+        "week": snapshot_week(snapshot_date),
+        "patients": len(df),
+    }
+    for label in LABELS:
+        config_diagnosis = getattr(config, label)
+        predictions = np.array(
+            [literal_eval(value) for value in df[f"{config_diagnosis.name} Predictions"]]
+        )
+        variables = {"Likelihood": df[f"{config_diagnosis.name} Likelihood"].to_numpy()}
+        for i, name in enumerate(bin_names(config_diagnosis.bin_boundaries)):
+            variables[name] = predictions[:, i]
+
+        snapshot[label] = {}
+        for variable, values in variables.items():
+            reference_variable = (reference or {}).get(label, {}).get(variable)
+            edges = reference_variable["edges"] if reference_variable else quantile_edges(values)
+            snapshot[label][variable] = histograms(values, groups, edges)
+    return snapshot
+
+
+def save_snapshot(snapshot, snapshot_dir):
+    """Save under the snapshot's ISO week, replacing an earlier ingest in the same week."""
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    with open(snapshot_dir / f"{snapshot['week']}.json", "w") as f:
+        json.dump(snapshot, f)
+
+
+def snapshot_paths(snapshot_dir):
+    """Snapshot files, oldest week first."""
+    return sorted(snapshot_dir.glob("*.json"))
+
+
+def load_snapshots(snapshot_dir):
+    """All snapshots, oldest first."""
+    snapshots = []
+    for path in snapshot_paths(snapshot_dir):
+        with open(path, "r") as f:
+            snapshots.append(json.load(f))
+    return snapshots
+
+
+def load_first_snapshot(snapshot_dir):
+    paths = snapshot_paths(snapshot_dir)
+    if not paths:
+        return None
+    with open(paths[0], "r") as f:
+        return json.load(f)
+
+
+def proportions(counts):
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    return counts / total if total else None
+
+
+def psi(reference, current, eps=1e-4):
+    """Population stability index between two histograms over the same edges; NaN if either is empty."""
+    p, q = proportions(reference), proportions(current)
+    if p is None or q is None:
+        return np.nan
+    p, q = np.clip(p, eps, None), np.clip(q, eps, None)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks(reference, current):
+    """
+    Kolmogorov-Smirnov statistic between two histograms over the same edges. Being
+    evaluated at the bin edges only, it is a lower bound on the exact statistic.
+    """
+    p, q = proportions(reference), proportions(current)
+    if p is None or q is None:
+        return np.nan
+    return float(np.max(np.abs(np.cumsum(p) - np.cumsum(q))))
+
+
+def compare(reference, current, label, grouping="All"):
+    """
+    PSI/KS of every variable of `label` and every group of `grouping` in either snapshot.
+    A group with no patients on one side has no PSI/KS, and is flagged in "Change" instead.
+    """
+    rows = []
+    for variable, variable_histograms in current[label].items():
+        edges = variable_histograms["edges"]
+        empty = [0] * (len(edges) - 1)
+        current_groups = variable_histograms["counts"][grouping]
+        reference_variable = reference[label].get(variable)
+        if reference_variable and reference_variable["edges"] != edges:
+            # not comparable bin by bin; can't happen for snapshots binned against the same first week
+            reference_variable = None
+            bins_differ = True
+        else:
+            bins_differ = False
+        reference_groups = reference_variable["counts"][grouping] if reference_variable else {}
+        for group in sorted(set(current_groups) | set(reference_groups)):
+            counts = current_groups.get(group, empty)
+            reference_counts = reference_groups.get(group, empty)
+            if bins_differ:
+                change = "Bins differ"
+            elif not sum(counts):
+                change = "Missing in current"
+            elif not sum(reference_counts):
+                change = "New in current"
+            else:
+                change = ""
+            rows.append(
+                {
+                    "Variable": variable,
+                    grouping: group,
+                    "Reference N": sum(reference_counts),
+                    "Current N": sum(counts),
+                    "PSI": psi(reference_counts, counts),
+                    "KS": ks(reference_counts, counts),
+                    "Change": change,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def psi_trend(snapshots, label, variable="Likelihood"):
+    """Week-over-week PSI of `variable` over the whole population."""
+    return pd.DataFrame(
+        {
+            "Week": [current["week"] for current in snapshots[1:]],
+            "PSI": [
+                psi(
+                    reference[label][variable]["counts"]["All"]["All"],
+                    current[label][variable]["counts"]["All"]["All"],
+                )
+                if reference[label][variable]["edges"] == current[label][variable]["edges"]
+                else np.nan
+                for reference, current in zip(snapshots, snapshots[1:])
+            ],
+        }
+    )
@@ -5,6 +5,7 @@ import random
 from toml import load as toml_load
 from datetime import datetime
 from config import Config
+from ingest import ingest
 
 config = Config(**toml_load("config.toml"))
 fake = Faker()
@@ -119,3 +120,6 @@ with open(config.patient_data, 'w', newline='') as csvfile:
     writer.writerows(patient_data)
 
 print("CSV file generated successfully.")
+
+ingest(config)
+print("Ingest completed successfully.")
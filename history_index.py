@@ -0,0 +1,183 @@
+"""
+Cross-patient inverted index over problem lists and clinical encounters.
+
+Every coded item is indexed as a `field:value` term, e.g. `icd10:F84.01A`,
+`problem:anxiety`, `diagnosis:asthma`, `medication:aspirin`, `procedure:...`, `lab:...`.
+Terms are kept sorted, and the postings of all terms are stored back to back
+(CSR layout), each sorted by (patient, date). An ICD-10 prefix therefore maps to one
+contiguous slice, and queries reduce to NumPy intersections/unions of sorted arrays.
+"""
+
+from ast import literal_eval
+
+import numpy as np
+
+FIELDS = ["icd10", "problem", "diagnosis", "medication", "procedure", "lab"]
+ENCOUNTER_FIELDS = {
+    "Diagnosis": "diagnosis",
+    "Medication": "medication",
+    "Procedure": "procedure",
+    "Lab Test": "lab",
+}
+HISTORY_COLUMNS = ["Active Medical History", "Resolved Medical History", "Clinical Encounters"]
+
+
+def normalize_term(field, value):
+    field, value = field.strip().lower(), value.strip()
+    return f"{field}:{value.upper() if field == 'icd10' else value.lower()}"
+
+
+def unknown_fields(terms):
+    """Fields in `terms` that aren't indexed, e.g. a typo that would silently match nothing."""
+    fields = [term.partition(":")[0].strip().lower() for term in terms if ":" in term]
+    return sorted(set(fields) - set(FIELDS))
+
+
+def clinical_events(active_pmhx, resolved_pmhx, clinical_encounters):
+    """
+    Yield (term, date) for every coded item in a patient's history, given the raw
+    "Active Medical History", "Resolved Medical History" and "Clinical Encounters" values.
+    """
+    for issue in literal_eval(active_pmhx) + literal_eval(resolved_pmhx):
+        yield normalize_term("icd10", issue["ICD-10"]), issue["Noted Date"]
+        yield normalize_term("problem", issue["Diagnosis Name"]), issue["Noted Date"]
+
+    for encounter_date, events in literal_eval(clinical_encounters).items():
+        for key, field in ENCOUNTER_FIELDS.items():
+            for value in events[key]:
+                yield normalize_term(field, value), encounter_date[:10]
+
+
+def to_days(value):
+    """Days since epoch, the unit dates are stored in."""
+    return np.datetime64(value, "D").astype(np.int32)
+
+
+class HistoryIndex:
+    def __init__(self, mrns, terms, offsets, docs, dates):
+        self.mrns = mrns
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.dates = dates
+
+    @classmethod
+    def build(cls, df):
+        """Build the index from the patient store; documents are its rows, in order."""
+        term_ids = {}
+        term_postings, docs, dates = [], [], []
+        for doc, row in enumerate(df.select(HISTORY_COLUMNS).iter_rows()):
+            for term, event_date in clinical_events(*row):
+                term_postings.append(term_ids.setdefault(term, len(term_ids)))
+                docs.append(doc)
+                dates.append(event_date)
+
+        vocabulary = np.array(list(term_ids))
+        # renumber term ids so that they follow the sorted vocabulary
+        rank = np.empty(len(vocabulary), dtype=np.int64)
+        rank[np.argsort(vocabulary)] = np.arange(len(vocabulary))
+        term_postings = rank[np.array(term_postings, dtype=np.int64)]
+        docs = np.array(docs, dtype=np.int32)
+        dates = np.array(dates, dtype="datetime64[D]").astype(np.int32)
+
+        order = np.lexsort((dates, docs, term_postings))
+        counts = np.bincount(term_postings, minlength=len(vocabulary))
+        return cls(
+            mrns=df["MRN"].to_numpy().astype(str),
+            terms=np.sort(vocabulary),
+            offsets=np.concatenate([[0], np.cumsum(counts)]),
+            docs=docs[order],
+            dates=dates[order],
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(**{key: arrays[key] for key in arrays.files})
+
+    def save(self, path):
+        np.savez(
+            path,
+            mrns=self.mrns,
+            terms=self.terms,
+            offsets=self.offsets,
+            docs=self.docs,
+            dates=self.dates,
+        )
+
+    def date_range(self):
+        """Earliest and latest indexed dates, or None if the index is empty."""
+        if not len(self.dates):
+            return None
+        return tuple(
+            np.datetime64(int(days), "D").astype(object)
+            for days in (self.dates.min(), self.dates.max())
+        )
+
+    def term_range(self, term):
+        """Range of term ids matching `term`, or every term under it if it ends with '*'."""
+        if term.endswith("*"):
+            field, _, prefix = term[:-1].partition(":")
+            prefix = normalize_term(field, prefix)
+            low = np.searchsorted(self.terms, prefix, side="left")
+            high = np.searchsorted(self.terms, prefix + "\uffff", side="left")
+            return low, high
+
+        field, _, value = term.partition(":")
+        term = normalize_term(field, value)
+        low = np.searchsorted(self.terms, term, side="left")
+        if low < len(self.terms) and self.terms[low] == term:
+            return low, low + 1
+        return low, low
+
+    def postings(self, term, start=None, end=None):
+        """Sorted, unique document ids with `term`, optionally only between `start` and `end`."""
+        if ":" not in term:
+            # no field given, so match the value in any field
+            return np.unique(
+                np.concatenate(
+                    [self.postings(f"{field}:{term}", start, end) for field in FIELDS]
+                )
+            )
+
+        low, high = self.term_range(term)
+        docs = self.docs[self.offsets[low] : self.offsets[high]]
+        if start is not None or end is not None:
+            dates = self.dates[self.offsets[low] : self.offsets[high]]
+            mask = np.ones(len(docs), dtype=bool)
+            if start is not None:
+                mask &= dates >= to_days(start)
+            if end is not None:
+                mask &= dates <= to_days(end)
+            docs = docs[mask]
+
+        if high - low == 1:
+            # a single term's postings are already sorted by document
+            return docs[np.concatenate([[True], docs[1:] != docs[:-1]])] if len(docs) else docs
+        return np.unique(docs)
+
+    def search(self, terms, match_all=True, start=None, end=None):
+        """Document ids matching all (AND) or any (OR) of `terms`."""
+        postings = [self.postings(term, start, end) for term in terms]
+        if not postings:
+            return np.array([], dtype=np.int32)
+
+        if not match_all:
+            return np.unique(np.concatenate(postings))
+
+        # intersect from the shortest list up, so that every step is as small as possible
+        postings.sort(key=len)
+        result = postings[0]
+        for docs in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, docs, assume_unique=True)
+        return result
+
+    def search_mrns(self, terms, match_all=True, start=None, end=None):
+        return self.mrns[self.search(terms, match_all, start, end)].tolist()
+
+
+def parse_terms(text):
+    """Ex: 'icd10:F84*, medication:aspirin' -> ['icd10:F84*', 'medication:aspirin']"""
+    return [term.strip() for term in text.split(",") if term.strip()]
@@ -0,0 +1,51 @@
+"""
+Builds the artifacts the dashboard reads from the weekly patient CSV export.
+
+Run after every data pull: `python ingest.py`
+"""
+
+import argparse
+from datetime import date
+
+import polars as pl
+from toml import load as toml_load
+
+from config import Config
+from drift import build_snapshot, load_first_snapshot, save_snapshot
+from history_index import HistoryIndex
+from similar_patients import PatientEmbeddings
+
+
+def build_patient_store(config):
+    """
+    Convert the patient CSV into a typed, MRN-sorted Parquet file, so that pages
+    can scan only the columns and row groups they need.
+    """
+    df = pl.read_csv(config.patient_data, infer_schema_length=None)
+    df = df.with_columns(
+        pl.col("Date of Birth").str.to_date(),
+        pl.col("Last Follow-up Date").str.to_date(),
+    ).sort("MRN")
+    df.write_parquet(config.patient_store, statistics=True)
+    return df
+
+
+def ingest(config, snapshot_date=None):
+    df = build_patient_store(config)
+    HistoryIndex.build(df).save(config.history_index)
+    PatientEmbeddings.build(df).save(config.patient_embeddings)
+    # bin every week against the first snapshot's edges, so that weeks stay comparable
+    reference = load_first_snapshot(config.snapshot_dir)
+    save_snapshot(build_snapshot(df, config, snapshot_date, reference), config.snapshot_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the dashboard's artifacts from the patient CSV")
+    parser.add_argument(
+        "--snapshot-date",
+        type=date.fromisoformat,
+        help="date of the data pull, e.g. when backfilling (default: today); one snapshot is kept per ISO week",
+    )
+    args = parser.parse_args()
+    ingest(Config(**toml_load("config.toml")), args.snapshot_date)
+    print("Ingest completed successfully.")
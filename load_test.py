@@ -0,0 +1,311 @@
+"""
+Headless load test for the dashboard.
+
+Simulates clinician sessions with Streamlit's AppTest. Each session repeatedly runs
+realistic flows:
+
+- All Patients: search a few names, toggle the diagnosis filters
+- Patient Lookup: open an MRN link, page encounters, switch diagnosis
+- Model Performance: open the page (tab switches are client-side and don't rerun)
+
+AppTest swaps process-global Streamlit state on every run, so concurrent AppTests
+cannot share a process. That shapes what the two phases below can measure:
+
+1. Latency: N sessions run at the same time, each in its own worker process. This is
+   per-process latency with no cross-session contention: the sessions run in parallel
+   on separate cores and separate caches, whereas one `streamlit run` server handles
+   every session in a single process, under one GIL. The p95/p99 and throughput are
+   therefore a lower bound on what one server shows under N sessions.
+   AppTest also has no fragment-only reruns: every widget interaction reruns the whole
+   page, so the "(full rerun)" steps time full-page reruns, an upper bound on the
+   fragment reruns a browser triggers for the same interaction.
+
+2. Memory: two fresh processes open 1 and K sessions one after another and keep them
+   alive. The difference in RSS over K - 1 is the per-session cost, measured with a
+   fresh allocator each time; the Streamlit cache entries' own size is the data a
+   server holds once, however many sessions it has.
+
+Exits non-zero if any flow failed, since failed flows stop early and skew latency.
+
+Usage: python load_test.py --sessions 20 --iterations 5 --memory-sessions 5
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psutil
+from streamlit.testing.v1 import AppTest
+from toml import load as toml_load
+
+from config import Config
+
+ALL_PATIENTS_PAGE = "pages/1_All_Patients.py"
+PATIENT_LOOKUP_PAGE = "pages/2_Patient_Lookup.py"
+MODEL_PERFORMANCE_PAGE = "pages/3_Model_Performance.py"
+
+# reruns in a warm-up, to bound how long workers wait for each other at the barrier
+WARMUP_RERUNS = 15
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def cache_mb():
+    """Size of every st.cache_data and st.cache_resource entry in this process, if available."""
+    try:
+        from streamlit.runtime.caching.cache_data_api import _data_caches
+        from streamlit.runtime.caching.cache_resource_api import _resource_caches
+    except ImportError:
+        return None
+    stats = _data_caches.get_stats() + _resource_caches.get_stats()
+    return sum(stat.byte_length for stat in stats) / 2**20
+
+
+class Session:
+    """One simulated clinician, holding one AppTest per page like a browser tab would."""
+
+    def __init__(self, session_id, names, mrns, timeout, seed):
+        self.session_id = session_id
+        self.names = names
+        self.mrns = mrns
+        self.timeout = timeout
+        self.rng = random.Random(seed + session_id)
+        self.latencies = defaultdict(list)
+        self.errors = []
+        self.apps = {
+            page: AppTest.from_file(page, default_timeout=timeout)
+            for page in [ALL_PATIENTS_PAGE, PATIENT_LOOKUP_PAGE, MODEL_PERFORMANCE_PAGE]
+        }
+
+    def timed(self, step, action):
+        start = time.perf_counter()
+        at = action()
+        self.latencies[step].append(time.perf_counter() - start)
+        if at.exception:
+            self.errors.append(f"{step}: {at.exception[0].message}")
+        return at
+
+    def all_patients_flow(self):
+        at = self.apps[ALL_PATIENTS_PAGE]
+        self.timed("all_patients.load", at.run)
+        for _ in range(3):
+            query = self.rng.choice(self.names)[: self.rng.randint(2, 4)]
+            self.timed("all_patients.search", at.sidebar.text_input[0].input(query).run)
+        self.timed("all_patients.filter", at.sidebar.checkbox[0].check().run)
+        self.timed("all_patients.filter", at.sidebar.checkbox[0].uncheck().run)
+        self.timed("all_patients.search", at.sidebar.text_input[0].input("").run)
+
+    def patient_lookup_flow(self):
+        at = self.apps[PATIENT_LOOKUP_PAGE]
+        at.query_params["mrn"] = self.rng.choice(self.mrns)
+        # a fresh run of the page, like following the MRN link from All Patients
+        self.timed("patient_lookup.open_mrn", at.run)
+        # these are fragment reruns in a browser, but full-page reruns under AppTest
+        if at.number_input:
+            self.timed(
+                "patient_lookup.page_encounters (full rerun)",
+                at.number_input[0].increment().run,
+            )
+        if at.radio:
+            self.timed(
+                "patient_lookup.switch_diagnosis (full rerun)",
+                at.radio[0].set_value("adhd").run,
+            )
+            self.timed(
+                "patient_lookup.switch_diagnosis (full rerun)",
+                at.radio[0].set_value("autism").run,
+            )
+
+    def model_performance_flow(self):
+        at = self.apps[MODEL_PERFORMANCE_PAGE]
+        self.timed("model_performance.load", at.run)
+
+    def run(self, iterations):
+        flows = [self.all_patients_flow, self.patient_lookup_flow, self.model_performance_flow]
+        for _ in range(iterations):
+            self.rng.shuffle(flows)
+            for flow in flows:
+                try:
+                    flow()
+                except Exception as e:
+                    self.errors.append(f"{flow.__name__}: {e!r}")
+
+
+def latency_worker(session_id, names, mrns, iterations, timeout, seed, barrier):
+    """One session in its own process; returns its latencies, errors and timings."""
+    errors = []
+    try:
+        # fill this process's caches first, so the measured session sees a warm server
+        warmup = Session(-1 - session_id, names, mrns, timeout, seed)
+        warmup.run(1)
+        errors += [f"warm-up {error}" for error in warmup.errors]
+        session = Session(session_id, names, mrns, timeout, seed)
+    finally:
+        # always reach the barrier, so a failed worker can't leave the others waiting
+        barrier.wait(timeout * WARMUP_RERUNS)
+
+    start = time.time()
+    session.run(iterations)
+    end = time.time()
+    return {
+        "latencies": dict(session.latencies),
+        "errors": errors + session.errors,
+        "start": start,
+        "end": end,
+    }
+
+
+def memory_worker(num_sessions, names, mrns, timeout, seed):
+    """Open `num_sessions` sessions one after another in a fresh process, keeping them alive."""
+    rss_start = rss_mb()
+    sessions = []
+    for session_id in range(num_sessions):
+        session = Session(session_id, names, mrns, timeout, seed)
+        session.run(1)
+        sessions.append(session)
+    return {
+        "rss_start": rss_start,
+        "rss_end": rss_mb(),
+        "cache": cache_mb(),
+        "errors": [error for session in sessions for error in session.errors],
+    }
+
+
+def percentiles(values):
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return {"count": len(values), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def measure_latency(context, args, names, mrns):
+    errors = []
+    with context.Manager() as manager, ProcessPoolExecutor(
+        max_workers=args.sessions, mp_context=context
+    ) as pool:
+        # start the measured sessions together, once every worker has warmed up
+        barrier = manager.Barrier(args.sessions)
+        futures = [
+            pool.submit(
+                latency_worker, i, names, mrns, args.iterations, args.timeout, args.seed, barrier
+            )
+            for i in range(args.sessions)
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(f"worker: {e!r}")
+    return results, errors
+
+
+def measure_memory(context, args, names, mrns):
+    # a fresh process per measurement, so neither reuses memory freed by the other
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as pool:
+        one = pool.submit(memory_worker, 1, names, mrns, args.timeout, args.seed).result()
+        many = pool.submit(
+            memory_worker, args.memory_sessions, names, mrns, args.timeout, args.seed
+        ).result()
+    per_session = (many["rss_end"] - one["rss_end"]) / (args.memory_sessions - 1)
+    return {
+        "imports": one["rss_start"],
+        "cached_data": one["cache"],
+        "first_session_total": one["rss_end"],
+        "per_session": per_session,
+        f"estimated_server_{args.sessions}_sessions": one["rss_end"]
+        + (args.sessions - 1) * per_session,
+    }, one["errors"] + many["errors"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the dashboard")
+    parser.add_argument("--sessions", type=int, default=10, help="number of concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="flow iterations per session")
+    parser.add_argument(
+        "--memory-sessions",
+        type=int,
+        default=5,
+        help="sessions opened in one process to measure the per-session memory (at least 2)",
+    )
+    parser.add_argument("--timeout", type=float, default=60, help="timeout per rerun, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this path")
+    args = parser.parse_args()
+    if args.memory_sessions < 2:
+        parser.error("--memory-sessions must be at least 2")
+
+    config = Config(**toml_load("config.toml"))
+    patients = pd.read_csv(config.patient_data, usecols=["MRN", "Name"])
+    names = patients["Name"].tolist()
+    mrns = patients["MRN"].tolist()
+    del patients
+
+    # spawn, so workers don't inherit any Streamlit state from this process
+    context = multiprocessing.get_context("spawn")
+    results, errors = measure_latency(context, args, names, mrns)
+    memory, memory_errors = measure_memory(context, args, names, mrns)
+    errors += [error for result in results for error in result["errors"]] + memory_errors
+
+    latencies = defaultdict(list)
+    for result in results:
+        for step, values in result["latencies"].items():
+            latencies[step].extend(values)
+    all_latencies = [value for values in latencies.values() for value in values]
+    elapsed = (
+        max(result["end"] for result in results) - min(result["start"] for result in results)
+        if results
+        else float("nan")
+    )
+
+    report = {
+        "sessions": args.sessions,
+        "iterations": args.iterations,
+        "elapsed_s": elapsed,
+        "reruns": len(all_latencies),
+        "throughput_reruns_per_s": len(all_latencies) / elapsed,
+        "latency": {"all": percentiles(all_latencies)} if all_latencies else {},
+        "rss_mb": memory,
+        "errors": len(errors),
+    }
+    report["latency"] |= {step: percentiles(values) for step, values in sorted(latencies.items())}
+
+    print(f"{args.sessions} sessions x {args.iterations} iterations in {elapsed:.1f}s")
+    print(
+        "Per-process latency, no cross-session contention: every session ran in its own "
+        "process, so one server under the same load will be slower."
+    )
+    print(f"Throughput: {report['throughput_reruns_per_s']:.1f} reruns/s ({report['reruns']} reruns)")
+    print(f"\n{'step':<48}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, stats in report["latency"].items():
+        print(f"{step:<48}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    print("(full rerun): AppTest reruns the whole page where a browser reruns only the fragment.")
+
+    print(f"\nMemory, from fresh processes with 1 and {args.memory_sessions} sessions:")
+    print(f"  interpreter and imports:  {memory['imports']:.1f} MB")
+    if memory["cached_data"] is not None:
+        print(f"  cached data:              {memory['cached_data']:.1f} MB (held once per server)")
+    print(f"  server with 1 session:    {memory['first_session_total']:.1f} MB")
+    print(f"  per additional session:   {memory['per_session']:.1f} MB (includes AppTest's element trees)")
+    print(
+        f"  estimated server with {args.sessions} sessions: "
+        f"{memory[f'estimated_server_{args.sessions}_sessions']:.1f} MB"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if errors:
+        print(f"\n{len(errors)} errors, first: {errors[0]}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import streamlit as st
+import os
 from toml import load as toml_load
 from scipy import stats
 import pandas as pd
 import plotly.graph_objs as go
 
 from config import Config
+from similar_patients import PatientEmbeddings
 
 st.set_page_config(
     page_title="Patient Lookup",
@@ -12,8 +14,31 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+ENCOUNTERS_PER_PAGE = 5
+
 config = Config(**toml_load("config.toml"))
-ALL_DF = pd.read_csv(config.patient_data)
+
+
+@st.cache_resource(max_entries=1)
+def load_patient_data(path, data_version):
+    # shared across sessions and reruns, so treat it as read-only;
+    # data_version (the file's mtime) makes a new weekly export invalidate it
+    return pd.read_csv(path)
+
+
+@st.cache_resource(max_entries=1)
+def load_patient_embeddings(path, data_version):
+    return PatientEmbeddings.load(path)
+
+
+DATA_VERSION = os.path.getmtime(config.patient_data)
+ALL_DF = load_patient_data(config.patient_data, DATA_VERSION)
+
+def format_age(age_in_years):
+    years = int(age_in_years)
+    months = int((age_in_years - years) * 12)
+    return f"{years}y {months}m"
+
 
 def render_demographics(df):
     demographics = ["Name", "Date of Birth", "Patient Status", "Sex", "Race", "Insurance", "Primary Care Provider", "Emergency Contact Name", "Emergency Contact Relationship", "Emergency Contact Home Phone", "Email Address", "Address"]
@@ -42,13 +67,25 @@ def render_pmhx(mrn_df):
     if not active_pmhx and not resolved_pmhx:
         st.write("NIL")
 
+@st.fragment
 def render_events(mrn_df):
     clinical_encounters = eval(mrn_df["Clinical Encounters"].iloc[0])
     st.header("🏥 Clinical Encounters", divider=True)
-    
-    print(clinical_encounters)
+
+    # paging only reruns this fragment, not the rest of the page
+    num_pages = max(1, -(-len(clinical_encounters) // ENCOUNTERS_PER_PAGE))
+    page = st.number_input(
+        f"Page (of {num_pages})",
+        min_value=1,
+        max_value=num_pages,
+        value=1,
+        key=f"encounters_page_{mrn_df['MRN'].iloc[0]}",
+    )
+    start = (page - 1) * ENCOUNTERS_PER_PAGE
+    page_encounters = list(clinical_encounters.items())[start : start + ENCOUNTERS_PER_PAGE]
+
     with st.container(height=500, border=False):
-        for index, (encounter_date, events) in enumerate(clinical_encounters.items(), start=1):
+        for index, (encounter_date, events) in enumerate(page_encounters, start=start + 1):
             st.subheader(f"{index}. {events['Encounter Type']} ({encounter_date})")
             diagnosis = events["Diagnosis"]
             medication = events["Medication"]
@@ -97,13 +134,105 @@ def format_bins(bin_boundaries):
     return ranges
 
 
+# data_version is only part of the cache key, for the ALL_DF these functions read
+@st.cache_data(max_entries=256)
+def build_subgroup_figure(mrn, label, data_version):
+    config_diagnosis = getattr(config, label)
+    mrn_df = ALL_DF[ALL_DF["MRN"] == mrn]
+    patient_name = mrn_df["Name"].iloc[0]
+    indiv_probability = mrn_df[f"{config_diagnosis.name} Likelihood"].iloc[0]
+    all_probability = ALL_DF[f"{config_diagnosis.name} Likelihood"]
+
+    # Subgroup analysis
+    year = pd.to_datetime(mrn_df["Date of Birth"]).dt.year.iloc[0]
+    sex = mrn_df["Sex"].iloc[0]
+    race = mrn_df["Race"].iloc[0]
+
+    fig = go.Figure()
+    fig.add_trace(
+        go.Box(
+            y=all_probability,
+            boxpoints=False,
+            name="Population",
+            showlegend=False,
+            line_color="blue",
+        )
+    )
+    fig.add_trace(
+        go.Box(
+            y=ALL_DF.loc[
+                pd.to_datetime(ALL_DF["Date of Birth"]).dt.year == year,
+                f"{config_diagnosis.name} Likelihood",
+            ],
+            boxpoints=False,
+            name=f"YOB ({year})",
+            showlegend=False,
+            line_color="blue",
+        )
+    )
+    fig.add_trace(
+        go.Box(
+            y=ALL_DF.loc[ALL_DF["Sex"] == sex, f"{config_diagnosis.name} Likelihood"],
+            boxpoints=False,
+            name=f"Sex ({sex})",
+            showlegend=False,
+            line_color="blue",
+        )
+    )
+    fig.add_trace(
+        go.Box(
+            y=ALL_DF.loc[ALL_DF["Race"] == race, f"{config_diagnosis.name} Likelihood"],
+            boxpoints=False,
+            name=f"Race ({race})",
+            showlegend=False,
+            line_color="blue",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=["Population", f"YOB ({year})", f"Sex ({sex})", f"Race ({race})"],
+            y=[
+                indiv_probability,
+                indiv_probability,
+                indiv_probability,
+                indiv_probability,
+            ],
+            mode="markers",
+            marker=dict(size=8, color="red"),
+            name=f"{patient_name}",
+        )
+    )
+
+    fig.update_layout(
+        title="Sub-group Analysis",
+        yaxis_title="Predicted Probabilities",
+        xaxis_title="Sub-Groups",
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="top",
+            y=1.1,
+            xanchor="right",
+            x=1,
+        ),
+    )
+    return fig
+
+
+@st.cache_data(max_entries=256)
+def compute_percentile(mrn, label, data_version):
+    config_diagnosis = getattr(config, label)
+    all_probability = ALL_DF[f"{config_diagnosis.name} Likelihood"]
+    indiv_probability = all_probability[ALL_DF["MRN"] == mrn].iloc[0]
+    return stats.percentileofscore(all_probability, indiv_probability)
+
+
 def render_likelihood(mrn, label):
     config_diagnosis = getattr(config, label)
     st.header(f"🩺 Likelihood of {config_diagnosis.name} diagnosis", divider=True)
 
     mrn_df = ALL_DF[ALL_DF["MRN"] == mrn]
     diagnosed = mrn_df[f"{config_diagnosis.name} Label"].iloc[0]
-    patient_name = mrn_df["Name"].iloc[0]
 
     if diagnosed:
         age_diagnosed = mrn_df[f"{config_diagnosis.name} Diagnosis Age"]
@@ -114,9 +243,7 @@ def render_likelihood(mrn, label):
     else:
         # Predicted probability for each bin
         indiv_probability = mrn_df[f"{config_diagnosis.name} Likelihood"].iloc[0]
-        all_probability = ALL_DF[f"{config_diagnosis.name} Likelihood"]
-
-        percentile = stats.percentileofscore(all_probability, indiv_probability)
+        percentile = compute_percentile(mrn, label, DATA_VERSION)
 
         if percentile > 50:
             st.markdown(
@@ -151,84 +278,72 @@ def render_likelihood(mrn, label):
             """
         )
 
-        # Subgroup analysis
-        year = pd.to_datetime(mrn_df["Date of Birth"]).dt.year.iloc[0]
-        sex = mrn_df["Sex"].iloc[0]
-        race = mrn_df["Race"].iloc[0]
-
-        fig = go.Figure()
-        fig.add_trace(
-            go.Box(
-                y=all_probability,
-                boxpoints=False,
-                name="Population",
-                showlegend=False,
-                line_color="blue",
-            )
-        )
-        fig.add_trace(
-            go.Box(
-                y=ALL_DF.loc[
-                    pd.to_datetime(ALL_DF["Date of Birth"]).dt.year == year,
-                    f"{config_diagnosis.name} Likelihood",
-                ],
-                boxpoints=False,
-                name=f"YOB ({year})",
-                showlegend=False,
-                line_color="blue",
-            )
-        )
-        fig.add_trace(
-            go.Box(
-                y=ALL_DF.loc[ALL_DF["Sex"] == sex, f"{config_diagnosis.name} Likelihood"],
-                boxpoints=False,
-                name=f"Sex ({sex})",
-                showlegend=False,
-                line_color="blue",
-            )
-        )
-        fig.add_trace(
-            go.Box(
-                y=ALL_DF.loc[ALL_DF["Race"] == race, f"{config_diagnosis.name} Likelihood"],
-                boxpoints=False,
-                name=f"Race ({race})",
-                showlegend=False,
-                line_color="blue",
-            )
-        )
-        fig.add_trace(
-            go.Scatter(
-                x=["Population", f"YOB ({year})", f"Sex ({sex})", f"Race ({race})"],
-                y=[
-                    indiv_probability,
-                    indiv_probability,
-                    indiv_probability,
-                    indiv_probability,
-                ],
-                mode="markers",
-                marker=dict(size=8, color="red"),
-                name=f"{patient_name}",
-            )
-        )
-
-        fig.update_layout(
-            title="Sub-group Analysis",
-            yaxis_title="Predicted Probabilities",
-            xaxis_title="Sub-Groups",
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=1.1,
-                xanchor="right",
-                x=1,
-            ),
-        )
+        fig = build_subgroup_figure(mrn, label, DATA_VERSION)
         st.plotly_chart(fig, use_container_width=True)
         st.caption(
             f"The patient's predicted probability for {config_diagnosis.name} is being compared to the whole dataset, and individuals of the same birth year, sex and race."
         )
 
+@st.fragment
+def render_likelihood_section(mrn):
+    # switching diagnosis only reruns this fragment; the figures are cached per (mrn, label)
+    label = st.radio(
+        "Diagnosis",
+        options=["autism", "adhd"],
+        format_func=lambda label: getattr(config, label).name,
+        horizontal=True,
+        key=f"likelihood_label_{mrn}",
+    )
+    render_likelihood(mrn, label)
+
+
+@st.fragment
+def render_similar_patients(mrn):
+    st.header("👥 Similar Patients", divider=True)
+    k = st.slider("Number of patients", min_value=5, max_value=50, value=10, key=f"similar_k_{mrn}")
+
+    similar_mrns, similarities = load_patient_embeddings(
+        config.patient_embeddings, os.path.getmtime(config.patient_embeddings)
+    ).similar(mrn, k)
+    if not similar_mrns:
+        st.write("NIL")
+        return
+
+    similar_df = pd.DataFrame({"MRN": similar_mrns, "Similarity": similarities}).merge(
+        ALL_DF[["MRN", "Name", "Autism Label", "Autism Diagnosis Age", "ADHD Label", "ADHD Diagnosis Age"]],
+        on="MRN",
+        how="left",
+    )
+    for label in ["Autism", "ADHD"]:
+        similar_df[f"{label} Diagnosis Age"] = [
+            format_age(age) if diagnosed else None
+            for diagnosed, age in zip(similar_df[f"{label} Label"], similar_df[f"{label} Diagnosis Age"])
+        ]
+        similar_df[f"{label} Label"] = similar_df[f"{label} Label"].astype(bool)
+    similar_df["MRN"] = "/Patient_Lookup?mrn=" + similar_df["MRN"]
+
+    st.dataframe(
+        similar_df,
+        column_config={
+            "MRN": st.column_config.LinkColumn(display_text=r"mrn=([\w\d]+)"),
+            "Similarity": st.column_config.ProgressColumn(
+                format="%.2f",
+                # centred embeddings can have negative cosine similarity
+                min_value=-1,
+                max_value=1,
+                help="Cosine similarity of the patients' coded histories",
+            ),
+            "Autism Label": st.column_config.CheckboxColumn(),
+            "ADHD Label": st.column_config.CheckboxColumn(),
+        },
+        hide_index=True,
+        use_container_width=True,
+    )
+    st.caption(
+        "Patients whose problem lists and clinical encounters (diagnoses, medications, procedures, lab tests) are most similar to this patient's."
+    )
+
+
 st.title("Search by MRN 👇")
 
 query_params = st.query_params.to_dict()
@@ -249,5 +364,5 @@ if query_mrn:
         render_demographics(mrn_df)
         render_pmhx(mrn_df)
         render_events(mrn_df)
-        render_likelihood(query_mrn, "autism")
-        render_likelihood(query_mrn, "adhd")
+        render_likelihood_section(query_mrn)
+        render_similar_patients(query_mrn)
@@ -0,0 +1,125 @@
+import streamlit as st
+from toml import load as toml_load
+import numpy as np
+import plotly.graph_objs as go
+
+from config import Config
+from drift import GROUP_COLUMNS, LABELS, compare, load_snapshots, proportions, psi_trend, snapshot_paths
+
+st.set_page_config(
+    page_title="Data Drift",
+    layout="wide",
+    initial_sidebar_state="expanded",
+)
+
+
+@st.cache_data(max_entries=1)
+def get_snapshots(snapshot_dir, versions):
+    # versions (file names and mtimes) makes a new or re-ingested snapshot invalidate it
+    return load_snapshots(snapshot_dir)
+
+
+def highlight_psi(value):
+    # common rule of thumb: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 major shift
+    if value > 0.25:
+        return "color: red"
+    if value > 0.1:
+        return "color: orange"
+    return ""
+
+
+def highlight_change(value):
+    # a group appearing or disappearing is itself a systemic change
+    return "color: red" if value else ""
+
+
+def render_histogram_delta(reference, current, label, variable, grouping, group):
+    edges = np.array(current[label][variable]["edges"])
+    centers = (edges[:-1] + edges[1:]) / 2
+    reference_variable = reference[label].get(variable)
+    if not reference_variable or reference_variable["edges"] != current[label][variable]["edges"]:
+        st.write("The snapshots don't share bins for this variable.")
+        return
+    reference_counts = reference_variable["counts"][grouping].get(group)
+    current_counts = current[label][variable]["counts"][grouping].get(group)
+    reference_p = proportions(reference_counts) if reference_counts else None
+    current_p = proportions(current_counts) if current_counts else None
+    if reference_p is None or current_p is None:
+        st.write("No patients in this group for one of the snapshots.")
+        return
+
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            x=centers,
+            y=current_p - reference_p,
+            width=np.diff(edges),
+            name="Delta",
+            marker_color="grey",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(x=centers, y=reference_p, mode="lines", name=reference["week"], line_color="blue")
+    )
+    fig.add_trace(
+        go.Scatter(x=centers, y=current_p, mode="lines", name=current["week"], line_color="red")
+    )
+    fig.update_layout(
+        title=f"{variable} ({grouping}: {group})",
+        xaxis_title="Predicted Probability",
+        yaxis_title="Proportion of Patients",
+        legend=dict(orientation="h", yanchor="top", y=1.1, xanchor="right", x=1),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+st.header("Data Drift 📊")
+st.caption(
+    "Compares the distribution of predictions between weekly snapshots. Large, systemic shifts may indicate changes at the data level that need further evaluation or re-training of the model."
+)
+
+config = Config(**toml_load("config.toml"))
+snapshots = get_snapshots(
+    config.snapshot_dir,
+    tuple((path.name, path.stat().st_mtime) for path in snapshot_paths(config.snapshot_dir)),
+)
+
+if len(snapshots) < 2:
+    st.write("At least two weekly snapshots are needed to measure drift.")
+    st.stop()
+
+weeks = [snapshot["week"] for snapshot in snapshots]
+current_week = st.sidebar.selectbox("Current snapshot", options=weeks[::-1])
+reference_weeks = [week for week in weeks[::-1] if week < current_week]
+if not reference_weeks:
+    st.write(f"There is no snapshot older than {current_week} to compare with. Please pick a later current snapshot.")
+    st.stop()
+reference_week = st.sidebar.selectbox("Reference snapshot", options=reference_weeks)
+grouping = st.sidebar.radio("Break down by", options=["All"] + GROUP_COLUMNS)
+
+current = snapshots[weeks.index(current_week)]
+reference = snapshots[weeks.index(reference_week)]
+
+for label, tab in zip(LABELS, st.tabs([getattr(config, label).name for label in LABELS])):
+    with tab:
+        st.subheader("Week-over-week PSI (Likelihood)", divider=True)
+        st.line_chart(psi_trend(snapshots, label), x="Week", y="PSI")
+
+        st.subheader(f"{current_week} vs {reference_week}", divider=True)
+        stats_df = compare(reference, current, label, grouping)
+        st.dataframe(
+            stats_df.style.applymap(highlight_psi, subset=["PSI"]).applymap(
+                highlight_change, subset=["Change"]
+            ),
+            column_config={
+                "PSI": st.column_config.NumberColumn(format="%.3f", help="Population stability index"),
+                "KS": st.column_config.NumberColumn(format="%.3f", help="Kolmogorov-Smirnov statistic"),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        col1, col2 = st.columns(2)
+        variable = col1.selectbox("Variable", options=stats_df["Variable"].unique(), key=f"variable_{label}")
+        group = col2.selectbox("Group", options=stats_df[grouping].unique(), key=f"group_{label}")
+        render_histogram_delta(reference, current, label, variable, grouping, group)
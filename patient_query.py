@@ -0,0 +1,88 @@
+"""
+Lazy Polars query layer for the All Patients page.
+
+The page's filter state is turned into a single lazy plan over the Parquet patient
+store. Polars pushes the filter and the column projection down into the scan, and
+the display formatting only runs on the rows and columns that are returned.
+"""
+
+import re
+from datetime import datetime
+from typing import List, Optional
+
+import polars as pl
+from pydantic import BaseModel
+
+LABELS = ["Autism", "ADHD"]
+
+
+class PatientQuery(BaseModel):
+    search: str = ""
+    show_autism: bool = False
+    show_adhd: bool = False
+    mrns: Optional[List[str]] = None  # e.g. a clinical history search result
+    columns: List[str] = ["Name", "Date of Birth"]
+    sort_by: str = "MRN"  # a column of the patient store, not a formatted column
+    descending: bool = True
+
+
+def format_age(age):
+    """Ex: 4.5 -> '4y 6m'"""
+    age = age.cast(pl.Float64)
+    years = age.floor()
+    months = ((age - years) * 12).floor()
+    return pl.format("{}y {}m", years.cast(pl.Int64), months.cast(pl.Int64))
+
+
+def format_age_since(date, now):
+    days = (pl.lit(now) - date.cast(pl.Datetime("us"))).dt.total_microseconds() / 86_400_000_000
+    years = (days / 365.25).floor()
+    months = ((days - years * 365.25) / 30.44).floor()
+    return pl.format("{}y {}m", years.cast(pl.Int64), months.cast(pl.Int64))
+
+
+def column_expressions(url, now):
+    """Display expression for every column the page can show, keyed by column name."""
+    expressions = {
+        "MRN": pl.concat_str([pl.lit(f"{url}/Patient_Lookup?mrn="), pl.col("MRN")]),
+        "Name": pl.col("Name"),
+        "Date of Birth": pl.col("Date of Birth"),
+        "Current Age": format_age_since(pl.col("Date of Birth"), now),
+        "Censoring Age": format_age(pl.col("Censoring Age")),
+        "Sex": pl.col("Sex"),
+        "Race": pl.col("Race"),
+        "Insurance": pl.col("Insurance"),
+    }
+    for label in LABELS:
+        expressions[f"{label} Likelihood"] = pl.col(f"{label} Likelihood") * 100
+        expressions[f"{label} Diagnosis Age"] = (
+            pl.when(pl.col(f"{label} Label") == 1)
+            .then(format_age(pl.col(f"{label} Diagnosis Age")))
+            .otherwise(None)
+        )
+    return expressions
+
+
+def build_plan(store, query, url, now=None):
+    """Return the lazy plan for `query`; nothing is read until it is collected."""
+    expressions = column_expressions(url, now or datetime.now())
+
+    predicate = (pl.col("Autism Label") == int(query.show_autism)) & (
+        pl.col("ADHD Label") == int(query.show_adhd)
+    )
+    if query.search:
+        predicate &= pl.col("Name").str.contains(f"(?i){re.escape(query.search)}")
+    if query.mrns is not None:
+        predicate &= pl.col("MRN").is_in(query.mrns)
+
+    columns = ["MRN"] + [column for column in query.columns if column != "MRN"]
+    return (
+        pl.scan_parquet(store)
+        .filter(predicate)
+        .sort(query.sort_by, descending=query.descending)
+        .select([expressions[column].alias(column) for column in columns])
+    )
+
+
+def run_query(store, query, url, now=None):
+    return build_plan(store, query, url, now).collect()
@@ -0,0 +1,111 @@
+"""
+"Similar patients" search over embeddings of each patient's coded history.
+
+At ingest, a Word2Vec model is trained locally on every patient's problem-list ICD-10
+codes and encounter diagnoses, medications, procedures and lab tests. A patient's
+embedding is the mean of their code vectors, centred on the mean over all patients
+(otherwise a direction common to everyone dominates the cosine) and L2-normalized.
+The embeddings are kept as one contiguous float32 matrix whose rows follow the
+patient store. Queries are exact cosine top-k, scored block by block with a single
+matrix product per block.
+"""
+
+import numpy as np
+
+from history_index import HISTORY_COLUMNS, clinical_events
+
+EMBEDDING_SIZE = 64
+BLOCK_SIZE = 65536
+EMBEDDED_FIELDS = ("icd10", "diagnosis", "medication", "procedure", "lab")
+
+
+def patient_codes(df):
+    """One 'sentence' of codes per patient, in the order they appear in their history."""
+    return [
+        [term for term, _ in clinical_events(*row) if term.startswith(EMBEDDED_FIELDS)]
+        for row in df.select(HISTORY_COLUMNS).iter_rows()
+    ]
+
+
+class PatientEmbeddings:
+    def __init__(self, mrns, vectors):
+        self.mrns = mrns
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.rows = {mrn: row for row, mrn in enumerate(mrns)}
+
+    @classmethod
+    def build(cls, df, epochs=10, seed=0):
+        # only needed at ingest, so the dashboard itself never imports gensim
+        from gensim.models import Word2Vec
+
+        sentences = patient_codes(df)
+        model = Word2Vec(
+            sentences,
+            vector_size=EMBEDDING_SIZE,
+            window=10,
+            min_count=2,
+            epochs=epochs,
+            seed=seed,
+            # more than one worker makes training order, and so the vectors, nondeterministic
+            workers=1,
+        )
+
+        vectors = np.zeros((len(sentences), EMBEDDING_SIZE), dtype=np.float32)
+        has_codes = np.zeros(len(sentences), dtype=bool)
+        for row, codes in enumerate(sentences):
+            codes = [code for code in codes if code in model.wv]
+            if codes:
+                vectors[row] = model.wv[codes].mean(axis=0)
+                has_codes[row] = True
+        if has_codes.any():
+            vectors[has_codes] -= vectors[has_codes].mean(axis=0)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1)
+        return cls(df["MRN"].to_numpy().astype(str), vectors)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays["mrns"], arrays["vectors"])
+
+    def save(self, path):
+        np.savez(path, mrns=self.mrns, vectors=self.vectors)
+
+    def search(self, queries, k, exclude=None):
+        """
+        Top-k rows by cosine similarity for each row of `queries` (m x EMBEDDING_SIZE),
+        skipping the row given in `exclude` for each query. Returns (rows, scores), both m x k.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, len(self.vectors), BLOCK_SIZE):
+            scores = queries @ self.vectors[start : start + BLOCK_SIZE].T
+            if exclude is not None:
+                for i, row in enumerate(exclude):
+                    if start <= row < start + BLOCK_SIZE:
+                        scores[i, row - start] = -np.inf
+            top = min(k, scores.shape[1])
+            block_rows = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            # merge this block's candidates with the best found so far
+            best_rows = np.concatenate([best_rows, block_rows + start], axis=1)
+            best_scores = np.concatenate(
+                [best_scores, np.take_along_axis(scores, block_rows, axis=1)], axis=1
+            )
+            keep = np.argsort(-best_scores, axis=1)[:, :k]
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        return best_rows, best_scores
+
+    def similar(self, mrn, k=10):
+        """The k patients most similar to `mrn`, as (mrns, scores)."""
+        row = self.rows.get(mrn)
+        if row is None or not self.vectors[row].any() or len(self.vectors) < 2:
+            # not ingested yet, no coded history, or no one else to compare with
+            return [], []
+        rows, scores = self.search(self.vectors[row], min(k, len(self.vectors) - 1), exclude=[row])
+        # the excluded patient itself comes back as -inf if k reaches the population size
+        finite = np.isfinite(scores[0])
+        return self.mrns[rows[0][finite]].tolist(), scores[0][finite].tolist()
@@ -0,0 +1,70 @@
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import polars as pl
+
+from drift import build_snapshot, compare, ks, psi, snapshot_week
+
+CONFIG = SimpleNamespace(
+    autism=SimpleNamespace(name="Autism", bin_boundaries=[0.0, 3.0]),
+    adhd=SimpleNamespace(name="ADHD", bin_boundaries=[0.0, 4.0]),
+)
+
+
+def patients(sexes, likelihoods):
+    return pl.DataFrame(
+        {
+            "Sex": sexes,
+            "Race": ["Asian"] * len(sexes),
+            "Insurance": ["Medicare"] * len(sexes),
+            "Autism Likelihood": likelihoods,
+            "Autism Predictions": [str([p, 1 - p]) for p in likelihoods],
+            "ADHD Likelihood": likelihoods,
+            "ADHD Predictions": [str([p, 1 - p]) for p in likelihoods],
+        }
+    )
+
+
+def test_psi_and_ks_edge_cases():
+    assert psi([5, 5, 0], [10, 10, 0]) == 0
+    assert ks([5, 5, 0], [10, 10, 0]) == 0
+    assert ks([10, 0], [0, 10]) == 1
+    # disjoint histograms are a large shift, not an infinite one
+    assert 0.25 < psi([10, 0], [0, 10]) < np.inf
+    # an empty side has no distribution to compare
+    assert np.isnan(psi([0, 0], [1, 2]))
+    assert np.isnan(ks([1, 2], [0, 0]))
+
+
+def test_snapshots_share_first_edges_and_flag_missing_groups():
+    rng = np.random.default_rng(0)
+    first = build_snapshot(
+        patients(["Male", "Female"] * 100, rng.uniform(0, 0.05, 200).tolist()),
+        CONFIG,
+        date(2026, 10, 19),
+    )
+    # small values get their own bins, instead of all falling into the first 2-3 of [0, 1]
+    edges = first["autism"]["Predictions (0-3y)"]["edges"]
+    assert len(edges) > 40 and edges[0] == 0 and edges[-1] == 1
+
+    current = build_snapshot(
+        patients(["Male"] * 200, rng.uniform(0, 0.05, 200).tolist()),
+        CONFIG,
+        date(2026, 10, 26),
+        reference=first,
+    )
+    assert current["autism"]["Predictions (0-3y)"]["edges"] == edges
+    assert (first["week"], current["week"]) == ("2026-W43", "2026-W44")
+
+    stats = compare(first, current, "autism", "Sex").set_index(["Variable", "Sex"])
+    assert stats.loc[("Likelihood", "Female"), "Change"] == "Missing in current"
+    assert stats.loc[("Likelihood", "Female"), "Current N"] == 0
+    assert np.isnan(stats.loc[("Likelihood", "Female"), "PSI"])
+    assert stats.loc[("Likelihood", "Male"), "Change"] == ""
+    assert stats.loc[("Likelihood", "Male"), "KS"] < 0.2
+
+
+def test_snapshot_week_is_iso_week():
+    assert snapshot_week(date(2026, 10, 19)) == snapshot_week(date(2026, 10, 25))
+    assert snapshot_week(date(2027, 1, 1)) == "2026-W53"
@@ -0,0 +1,65 @@
+from datetime import date
+
+import polars as pl
+
+from history_index import HistoryIndex, parse_terms, unknown_fields
+
+
+def problem(icd10, name, noted_date):
+    return {"Diagnosis Name": name, "ICD-10": icd10, "Noted Date": noted_date}
+
+
+def encounter(diagnosis=(), medication=()):
+    return {
+        "Encounter Type": "Office Visit",
+        "Diagnosis": list(diagnosis),
+        "Medication": list(medication),
+        "Procedure": [],
+        "Lab Test": [],
+    }
+
+
+def build_index():
+    patients = [
+        ("A1", [problem("F84.01A", "autism", "2015-03-01")], [],
+         {"2019-05-01 10:00": encounter(medication=["Aspirin"])}),
+        ("B2", [problem("F84.55B", "autism", "2021-06-01")], [problem("J45.00A", "asthma", "2016-01-01")],
+         {"2016-02-01 09:00": encounter(diagnosis=["cough"])}),
+        ("C3", [], [],
+         {"2022-01-01 08:00": encounter(medication=["aspirin"]), "2015-01-01 08:00": encounter(medication=["aspirin"])}),
+    ]
+    df = pl.DataFrame(
+        {
+            "MRN": [mrn for mrn, *_ in patients],
+            "Active Medical History": [str(active) for _, active, _, _ in patients],
+            "Resolved Medical History": [str(resolved) for _, _, resolved, _ in patients],
+            "Clinical Encounters": [str(encounters) for *_, encounters in patients],
+        }
+    )
+    return HistoryIndex.build(df)
+
+
+def test_search_prefix_and_or_with_dates():
+    index = build_index()
+
+    # an ICD-10 prefix covers every code under it; fields and values are case-insensitive
+    assert index.search_mrns(["icd10:F84*"]) == ["A1", "B2"]
+    assert index.search_mrns(["ICD10:f84.0*"]) == ["A1"]
+    assert index.search_mrns(["Medication:ASPIRIN"]) == ["A1", "C3"]
+
+    assert index.search_mrns(["icd10:F84*", "medication:aspirin"]) == ["A1"]
+    assert index.search_mrns(["icd10:F84*", "medication:aspirin"], match_all=False) == ["A1", "B2", "C3"]
+    assert index.search_mrns(["icd10:F84*", "diagnosis:missing"]) == []
+
+    # only events inside the date range count, for every term
+    assert index.search_mrns(["medication:aspirin"], start=date(2020, 1, 1)) == ["C3"]
+    assert index.search_mrns(["icd10:F84*"], end=date(2016, 12, 31)) == ["A1"]
+    assert index.search_mrns(["asthma"], start=date(2015, 1, 1), end=date(2016, 6, 30)) == ["B2"]
+
+    assert index.date_range() == (date(2015, 1, 1), date(2022, 1, 1))
+
+
+def test_parse_terms_and_unknown_fields():
+    terms = parse_terms(" icd10:F84*, , Medicine:aspirin,cough ")
+    assert terms == ["icd10:F84*", "Medicine:aspirin", "cough"]
+    assert unknown_fields(terms) == ["medicine"]
@@ -0,0 +1,67 @@
+import re
+from datetime import date, datetime
+
+import polars as pl
+
+from patient_query import PatientQuery, build_plan, run_query
+
+URL = "http://localhost:8501"
+
+
+def write_store(tmp_path):
+    store = tmp_path / "patient_data.parquet"
+    pl.DataFrame(
+        {
+            "MRN": ["A100001", "B100002", "C100003", "D100004"],
+            "Name": ["Ann Lee", "Bob (Jr.) Ray", "Cara Ann", "Dan Roe"],
+            "Date of Birth": [date(2018, 1, 1)] * 4,
+            "Censoring Age": [4, 5, 6, 7],
+            "Sex": ["Female", "Male", "Female", "Male"],
+            "Race": ["Asian"] * 4,
+            "Insurance": ["Medicare"] * 4,
+            "Autism Label": [0, 0, 1, 0],
+            "Autism Diagnosis Age": [None, None, 4.5, None],
+            "Autism Likelihood": [0.1, 0.2, 0.3, 0.4],
+            "ADHD Label": [0, 0, 0, 1],
+            "ADHD Diagnosis Age": [None, None, None, 6.25],
+            "ADHD Likelihood": [0.5, 0.6, 0.7, 0.8],
+        }
+    ).write_parquet(store)
+    return store
+
+
+def test_run_query_filters_projects_and_formats(tmp_path):
+    store = write_store(tmp_path)
+
+    # label predicate: only undiagnosed patients, newest MRN first
+    result = run_query(store, PatientQuery(columns=["Name", "Autism Likelihood"]), URL)
+    assert result.columns == ["MRN", "Name", "Autism Likelihood"]
+    assert result["Name"].to_list() == ["Bob (Jr.) Ray", "Ann Lee"]
+    assert result["MRN"][0] == f"{URL}/Patient_Lookup?mrn=B100002"
+    assert result["Autism Likelihood"].to_list() == [20.0, 10.0]
+
+    # the search is case-insensitive and literal, even with regex characters
+    result = run_query(store, PatientQuery(search="(jr.)", columns=["Name"]), URL)
+    assert result["Name"].to_list() == ["Bob (Jr.) Ray"]
+
+    result = run_query(
+        store,
+        PatientQuery(show_autism=True, columns=["Autism Diagnosis Age", "Censoring Age"]),
+        URL,
+    )
+    assert result.to_dicts() == [
+        {
+            "MRN": f"{URL}/Patient_Lookup?mrn=C100003",
+            "Autism Diagnosis Age": "4y 6m",
+            "Censoring Age": "6y 0m",
+        }
+    ]
+
+
+def test_build_plan_projects_only_needed_columns(tmp_path):
+    store = write_store(tmp_path)
+    plan = build_plan(
+        store, PatientQuery(columns=["Current Age"]), URL, now=datetime(2020, 7, 1)
+    ).explain()
+    # only MRN, Date of Birth and the two labels are read from the 13-column store
+    assert re.search(r"PROJECT 4/13 COLUMNS", plan)